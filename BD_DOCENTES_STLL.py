@@ -1,13 +1,17 @@
+import numpy as np
+import openpyxl
 import pandas as pd
-from tabulate import tabulate
 from pathlib import Path
 import shutil
 import datetime
+import functools
 import logging
 import json
 import argparse
+import os
 import re
 import sys
+import threading
 import time
 
 try:
@@ -15,6 +19,114 @@ try:
 except ImportError:
     unidecode = None
 
+# calamine parsea el XLSX en streaming (mucho más rápido y con menos memoria
+# que el DOM completo de openpyxl); si no está instalado se deja que pandas
+# elija el motor según la extensión (xlrd para .xls, openpyxl para .xlsx).
+try:
+    import python_calamine  # noqa: F401
+    _EXCEL_ENGINE = "calamine"
+except ImportError:
+    _EXCEL_ENGINE = None
+
+# numba es opcional: si está disponible, la validación masiva de RUT al abrir
+# el archivo se compila a código nativo y se paraleliza por filas.
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# pyarrow respalda las columnas de texto con buffers contiguos: varias veces
+# menos memoria que un PyObject por celda y kernels .str más rápidos.
+try:
+    import pyarrow  # noqa: F401
+    _TIENE_PYARROW = True
+except ImportError:
+    _TIENE_PYARROW = False
+
+# Patrones compilados una sola vez a nivel de módulo: las validaciones se
+# ejecutan por cada celda en hojas grandes y recompilar el patrón en cada
+# llamada es costo innecesario.
+_RUT_CLEAN_RE = re.compile(r"[.\-\s]")
+_RUT_FMT_RE = re.compile(r"^\d{7,8}[0-9K]$")
+_EMAIL_RE = re.compile(r'^[\w\.-]+@[\w\.-]+\.\w+$')
+_TEL_STRIP_RE = re.compile(r"[ \-()]+")
+# Factores del dígito verificador ya expandidos para un RUT de hasta 8
+# dígitos; evita recalcular el ciclo 2..7 con módulo en cada posición.
+_RUT_FACTORS = (2, 3, 4, 5, 6, 7, 2, 3)
+
+# Tabla de traducción para quitar tildes/diéresis del español: str.translate
+# es una búsqueda en C por carácter, mucho más barato que llamar a unidecode
+# por cada celda. unidecode queda solo como respaldo para caracteres fuera
+# de la tabla.
+_ACCENT_MAP = str.maketrans("áéíóúüñÁÉÍÓÚÜÑ", "aeiouunAEIOUUN")
+
+
+def normalizar_texto(texto: str) -> str:
+    texto = texto.lower().translate(_ACCENT_MAP)
+    if unidecode and not texto.isascii():
+        texto = unidecode(texto)
+    return texto
+
+
+# A nivel de módulo (no usan self) y memoizadas: los mismos RUT se normalizan
+# una y otra vez al reconstruir índices y validar entradas repetidas en una
+# sesión; con la caché el caso repetido es una búsqueda de diccionario.
+@functools.lru_cache(maxsize=4096)
+def clean_rut(rut) -> str:
+    if not isinstance(rut, str):
+        rut = str(rut or "")
+    return _RUT_CLEAN_RE.sub("", rut).upper()
+
+
+def normalizar_ruts(serie: pd.Series) -> pd.Series:
+    # Versión vectorizada de clean_rut para columnas completas: el patrón
+    # compilado corre en C sobre toda la Serie en vez de una llamada de
+    # Python por celda.
+    return serie.fillna("").astype(str).str.replace(_RUT_CLEAN_RE, "", regex=True).str.upper()
+
+
+@functools.lru_cache(maxsize=4096)
+def format_rut(rut: str) -> str:
+    rn = clean_rut(rut)
+    if len(rn) < 2:
+        return rut
+    num, dv = rn[:-1], rn[-1]
+    return f"{num}-{dv}"
+
+
+if numba is not None:
+    _RUT_FACTORS_NP = np.array(_RUT_FACTORS, dtype=np.int64)
+
+    @numba.njit(cache=True, parallel=True)
+    def _ruts_validos_numba(arr, largos):
+        # arr: matriz (n, 10) de bytes ASCII con cada RUT ya normalizado y
+        # rellenado con ceros; largos: largo real de cada RUT (dígitos + DV).
+        n = arr.shape[0]
+        out = np.zeros(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            largo = largos[i]
+            if largo < 8 or largo > 9:
+                continue
+            total = 0
+            valido = True
+            for k in range(largo - 1):
+                c = arr[i, largo - 2 - k]
+                if c < 48 or c > 57:
+                    valido = False
+                    break
+                total += (c - 48) * _RUT_FACTORS_NP[k]
+            if not valido:
+                continue
+            mod = 11 - (total % 11)
+            if mod == 10:
+                dv_ok = 75  # 'K'
+            elif mod == 11:
+                dv_ok = 48  # '0'
+            else:
+                dv_ok = 48 + mod
+            out[i] = arr[i, largo - 1] == dv_ok
+        return out
+
 try:
     from colorama import Fore, Style, init
     init(autoreset=True)
@@ -35,6 +147,11 @@ def mostrar_mensaje(msg, tipo="info"):
 
 
 def animacion_carga(msg="Cargando", duracion=2):
+    # Sin TTY (cron, salida redirigida) la animación solo suma segundos de
+    # espera fija a cada guardado; GESTOR_ANIMATE=0 la desactiva también
+    # en terminal interactivo.
+    if not sys.stdout.isatty() or os.environ.get("GESTOR_ANIMATE", "1") == "0":
+        return
     for i in range(duracion * 2):
         sys.stdout.write(Fore.YELLOW + f"\r⏳ {msg}{'.' * (i % 4)}   ")
         sys.stdout.flush()
@@ -46,16 +163,20 @@ def explorar_directorios(inicio: Path = Path.home()) -> Path:
     current = inicio
     while True:
         try:
-            items = sorted([p for p in current.iterdir()])
+            # os.scandir entrega DirEntry con el stat cacheado del readdir:
+            # un syscall por entrada, contra los stat extra que agrega
+            # iterdir() + is_dir() por cada ítem.
+            with os.scandir(current) as it:
+                items = sorted(it, key=lambda e: e.name)
         except PermissionError:
             mostrar_mensaje(f"No se puede acceder a {current}. Subiendo nivel.", "advertencia")
             current = current.parent
             continue
 
         print(f"\n📂 Directorio: {current}")
-        for i, p in enumerate(items, 1):
-            tipo = "📁" if p.is_dir() else "📄"
-            print(f"{i:2d}. {tipo} {p.name}")
+        for i, e in enumerate(items, 1):
+            tipo = "📁" if e.is_dir() else "📄"
+            print(f"{i:2d}. {tipo} {e.name}")
         print(" 0. 🔙 Subir nivel")
         choice = input("Selecciona número (o 'q' para cancelar): ").strip().lower()
         if choice == 'q':
@@ -73,15 +194,32 @@ def explorar_directorios(inicio: Path = Path.home()) -> Path:
         elif 1 <= idx <= len(items):
             sel = items[idx-1]
             if sel.is_dir():
-                current = sel
-            elif sel.is_file() and sel.suffix.lower() in ('.xlsx', '.xlsm', '.xls'):
-                return sel
+                current = Path(sel.path)
+            elif sel.is_file() and os.path.splitext(sel.name)[1].lower() in ('.xlsx', '.xlsm', '.xls'):
+                return Path(sel.path)
             else:
                 mostrar_mensaje("No es un archivo Excel válido (.xlsx/.xlsm/.xls). Elige otro.", "advertencia")
         else:
             mostrar_mensaje("Índice fuera de rango.", "error")
 
 
+def renderizar_tabla(df: pd.DataFrame) -> str:
+    # Render propio con una sola pasada de anchos vectorizada; tabulate
+    # recorre cada celda dos veces en puro Python y se nota al volcar
+    # resultados de búsqueda grandes.
+    vals = df.astype(str)
+    anchos = [max(int(vals[c].str.len().max()) if len(vals) else 0, len(str(c)))
+              for c in df.columns]
+    borde_sup = "╒" + "╤".join("═" * (a + 2) for a in anchos) + "╕"
+    borde_med = "╞" + "╪".join("═" * (a + 2) for a in anchos) + "╡"
+    borde_inf = "╘" + "╧".join("═" * (a + 2) for a in anchos) + "╛"
+    fmt = "│ " + " │ ".join(f"{{:<{a}}}" for a in anchos) + " │"
+    lineas = [borde_sup, fmt.format(*(str(c) for c in df.columns)), borde_med]
+    lineas.extend(fmt.format(*fila) for fila in vals.itertuples(index=False, name=None))
+    lineas.append(borde_inf)
+    return "\n".join(lineas)
+
+
 def input_validado(prompt, validacion_func, mensaje_error, formato_func=None, opcional=False):
     while True:
         valor = input(prompt).strip()
@@ -110,6 +248,14 @@ class GestorDocentes:
         self.col_rut = None
         self.col_email = None
         self.col_tel = None
+        self._rut_index = {}  # RUT normalizado -> índice de fila
+        self._rut_duplicados = set()  # claves presentes en más de una fila
+        self._pending_rows = []  # registros agregados aún no materializados
+        self._dirty_cells = set()  # (fila, columna) editadas desde el último guardado
+        self._estructura_cambiada = False  # altas/bajas obligan reescritura completa
+        self._df_norm = None  # copia normalizada del DataFrame para buscar
+        self._loaded = False  # las filas se leen recién en la primera operación
+        self._filas_archivo = None  # filas reportadas por el probe de encabezados
 
         logging.basicConfig(
             filename=str(ruta.parent / "gestor_docentes.log"),
@@ -121,18 +267,31 @@ class GestorDocentes:
 
     def acquire_lock(self):
         start = time.time()
-        while self.lock_file.exists():
-            if time.time() - start > self.lock_timeout:
-                mostrar_mensaje("El archivo está bloqueado por mucho tiempo. Verifique manualmente.", "advertencia")
-                logging.warning("Timeout esperando lock para %s", self.ruta)
+        espera = 0.01
+        while True:
+            try:
+                # O_CREAT|O_EXCL crea el lock de forma atómica: cierra la
+                # ventana entre exists() y write_text en la que dos procesos
+                # podían creerse dueños del lock a la vez.
+                fd = os.open(str(self.lock_file), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if time.time() - start > self.lock_timeout:
+                    mostrar_mensaje("El archivo está bloqueado por mucho tiempo. Verifique manualmente.", "advertencia")
+                    logging.warning("Timeout esperando lock para %s", self.ruta)
+                    return False
+                # Backoff exponencial: reintentos rápidos al inicio sin quedar
+                # sondeando cada segundo fijo como antes.
+                time.sleep(espera)
+                espera = min(espera * 2, 1.0)
+                continue
+            except OSError as e:
+                logging.error("No se pudo crear archivo de lock: %s", e)
                 return False
-            time.sleep(1)
-        try:
-            self.lock_file.write_text(str(time.time()))
+            try:
+                os.write(fd, str(time.time()).encode())
+            finally:
+                os.close(fd)
             return True
-        except Exception as e:
-            logging.error("No se pudo crear archivo de lock: %s", e)
-            return False
 
     def release_lock(self):
         try:
@@ -141,18 +300,6 @@ class GestorDocentes:
         except Exception as e:
             logging.error("No se pudo eliminar archivo de lock: %s", e)
 
-    def clean_rut(self, rut: str) -> str:
-        if not isinstance(rut, str):
-            rut = str(rut or "")
-        return re.sub(r"[.\-\s]", "", rut).upper()
-
-    def format_rut(self, rut: str) -> str:
-        rn = self.clean_rut(rut)
-        if len(rn) < 2:
-            return rut
-        num, dv = rn[:-1], rn[-1]
-        return f"{num}-{dv}"
-
     def leer(self) -> pd.DataFrame:
         if not self.ruta.exists():
             mostrar_mensaje(f"No se encontró {self.ruta}.", "advertencia")
@@ -172,19 +319,69 @@ class GestorDocentes:
                     mostrar_mensaje(f"No se pudo crear el archivo: {e}", "error")
                     logging.error("Error al crear nuevo Excel: %s", e, exc_info=True)
                     sys.exit(1)
+                self._loaded = True
+                self._filas_archivo = 0
                 return df
             else:
                 mostrar_mensaje("No se creó archivo. Saliendo.", "info")
                 sys.exit(0)
+        # Al abrir solo se lee la fila de encabezados (modo read_only); las
+        # filas completas se cargan recién cuando alguna operación las pide,
+        # así el arranque no depende del tamaño de la hoja.
         try:
-            df = pd.read_excel(self.ruta, dtype=str)
-            df = df.fillna("")
-            self.columnas = df.columns.tolist()
+            wb = openpyxl.load_workbook(self.ruta, read_only=True)
+            ws = wb.active
+            encabezados = next(ws.iter_rows(max_row=1, values_only=True), ())
+            if ws.max_row:
+                self._filas_archivo = max(ws.max_row - 1, 0)
+            wb.close()
+            self.columnas = [str(c) if c is not None else "" for c in encabezados]
+            self._loaded = False
+            return pd.DataFrame(columns=self.columnas)
+        except Exception as e:
+            # openpyxl no puede abrir .xls (que el explorador acepta y el
+            # motor de lectura sí entiende): si el probe falla se cae a la
+            # carga completa inmediata en lugar de abortar.
+            logging.warning("Probe de encabezados falló (%s); se carga completo.", e)
+            return self._ensure_loaded(pd.DataFrame())
+
+    def _ensure_loaded(self, df: pd.DataFrame) -> pd.DataFrame:
+        if self._loaded:
             return df
+        try:
+            df = pd.read_excel(self.ruta, dtype=str, engine=_EXCEL_ENGINE)
+            df = df.fillna("")
+            if _TIENE_PYARROW:
+                df = df.convert_dtypes(dtype_backend="pyarrow")
         except Exception as e:
             logging.error(f"Error al leer Excel: {e}", exc_info=True)
             mostrar_mensaje(f"Error al leer Excel: {e}", "error")
             sys.exit(1)
+        # El probe de encabezados normaliza los nombres distinto que pandas
+        # (celda vacía -> "" contra "Unnamed: N", números como texto): alinear
+        # el DataFrame con los nombres que el usuario ya mapeó. Con nombres
+        # repetidos se conserva la deduplicación de pandas ("RUT.1").
+        if (self.columnas and len(self.columnas) == len(df.columns)
+                and len(set(self.columnas)) == len(self.columnas)):
+            df.columns = self.columnas
+        else:
+            self.columnas = df.columns.tolist()
+        self._loaded = True
+        self._filas_archivo = len(df)
+        self._df_norm = None
+        self._indexar_y_validar_ruts(df)
+        return df
+
+    def _indexar_y_validar_ruts(self, df: pd.DataFrame):
+        self.construir_indice_rut(df)
+        if self.col_rut and len(df):
+            invalidos = self.validar_ruts_masivo(df)
+            if invalidos:
+                filas = ", ".join(str(i + 2) for i in invalidos[:10])
+                extra = ", ..." if len(invalidos) > 10 else ""
+                mostrar_mensaje(
+                    f"{len(invalidos)} registro(s) con RUT inválido (filas Excel: {filas}{extra}).",
+                    "advertencia")
 
     def backup(self):
         if not self.ruta.exists():
@@ -197,48 +394,119 @@ class GestorDocentes:
         except Exception as e:
             logging.error(f"Error al crear backup: {e}", exc_info=True)
 
+    def _escribir_excel(self, df: pd.DataFrame, destino: Path = None):
+        # Workbook en modo write_only: serializa fila a fila sin construir el
+        # árbol completo de celdas en memoria como hace df.to_excel.
+        wb = openpyxl.Workbook(write_only=True)
+        ws = wb.create_sheet()
+        ws.append(list(df.columns))
+        for row in df.itertuples(index=False, name=None):
+            ws.append(row)
+        wb.save(destino or self.ruta)
+
+    def _solo_altas_pendientes(self) -> bool:
+        # Solo hubo altas desde el último guardado: se pueden anexar al final
+        # del workbook existente sin cargar el DataFrame ni reescribir las
+        # filas que no cambiaron.
+        return (bool(self._pending_rows)
+                and not self._dirty_cells
+                and not self._estructura_cambiada
+                and self.ruta.exists())
+
+    def _anexar_filas(self, destino: Path):
+        wb = openpyxl.load_workbook(self.ruta)
+        ws = wb.active
+        for fila in self._pending_rows:
+            ws.append([fila.get(c, "") for c in self.columnas])
+        wb.save(destino)
+
+    def _puede_guardar_incremental(self, df: pd.DataFrame) -> bool:
+        # Solo vale la pena (y solo es correcto) retocar celdas sueltas si el
+        # archivo en disco sigue alineado fila a fila con el DataFrame: sin
+        # altas ni bajas desde el último guardado y con pocas celdas tocadas.
+        return (bool(self._dirty_cells)
+                and not self._estructura_cambiada
+                and self.ruta.exists()
+                and len(self._dirty_cells) < 0.2 * df.size)
+
+    def _escribir_celdas_sucias(self, df: pd.DataFrame, destino: Path):
+        wb = openpyxl.load_workbook(self.ruta)
+        ws = wb.active
+        col_pos = {c: j + 1 for j, c in enumerate(self.columnas)}
+        for fila, col in self._dirty_cells:
+            ws.cell(row=fila + 2, column=col_pos[col], value=df.at[fila, col])
+        wb.save(destino)
+
     def guardar(self, df: pd.DataFrame):
+        if self.ruta.suffix.lower() == '.xls':
+            # openpyxl solo emite XLSX: guardar sobre un .xls dejaría un
+            # archivo mal etiquetado que Excel rechaza. El formato antiguo
+            # queda de solo lectura.
+            mostrar_mensaje("El formato .xls es de solo lectura: convierta el archivo a .xlsx para guardar cambios.", "error")
+            logging.warning("Guardado rechazado sobre destino .xls: %s", self.ruta)
+            return
         if not self.acquire_lock():
             mostrar_mensaje("No se pudo obtener lock para guardar. Abortando.", "error")
             return
+        # El backup se copia en un hilo mientras se serializa el nuevo archivo
+        # a una ruta temporal, en vez de encadenar copia y escritura completas;
+        # el original recién se reemplaza (atómico) cuando ambas terminaron.
+        hilo_backup = None
+        destino_tmp = self.ruta.with_name(self.ruta.name + ".tmp")
         try:
             if self.ruta.exists():
-                self.backup()
+                hilo_backup = threading.Thread(target=self.backup)
+                hilo_backup.start()
             animacion_carga("Guardando")
-            df.to_excel(self.ruta, index=False)
+            solo_altas = self._solo_altas_pendientes()
+            if solo_altas:
+                self._anexar_filas(destino_tmp)
+            elif self._puede_guardar_incremental(df):
+                self._escribir_celdas_sucias(df, destino_tmp)
+            else:
+                self._escribir_excel(df, destino_tmp)
+            if hilo_backup:
+                hilo_backup.join()
+            os.replace(destino_tmp, self.ruta)
+            if solo_altas:
+                if self._filas_archivo is not None:
+                    self._filas_archivo += len(self._pending_rows)
+                self._pending_rows = []
+                self._df_norm = None
+            self._dirty_cells.clear()
+            self._estructura_cambiada = False
             logging.info("Archivo guardado correctamente.")
             mostrar_mensaje("Archivo guardado exitosamente.", "exito")
         except Exception as e:
             logging.error(f"Error al guardar Excel: {e}", exc_info=True)
             mostrar_mensaje(f"No se pudo guardar el archivo: {e}", "error")
         finally:
+            if hilo_backup:
+                hilo_backup.join()
+            if destino_tmp.exists():
+                try:
+                    destino_tmp.unlink()
+                except OSError:
+                    pass
             self.release_lock()
 
     def validar_rut(self, rut: str) -> bool:
-        rut_clean = self.clean_rut(rut)
-        if not re.match(r"^\d{7,8}[0-9K]$", rut_clean):
+        rut_clean = clean_rut(rut)
+        if not _RUT_FMT_RE.match(rut_clean):
             return False
         num = rut_clean[:-1]
         dv = rut_clean[-1]
-        try:
-            reversed_digits = map(int, reversed(num))
-            factors = [2, 3, 4, 5, 6, 7]
-            total = 0
-            factor_index = 0
-            for d in reversed_digits:
-                total += d * factors[factor_index]
-                factor_index = (factor_index + 1) % len(factors)
-            mod = 11 - (total % 11)
-            dv_calculado = 'K' if mod == 10 else '0' if mod == 11 else str(mod)
-            return dv_calculado == dv
-        except Exception:
-            return False
+        # El regex ya garantiza que num son solo dígitos.
+        total = sum(int(c) * f for c, f in zip(reversed(num), _RUT_FACTORS))
+        mod = 11 - (total % 11)
+        dv_calculado = 'K' if mod == 10 else '0' if mod == 11 else str(mod)
+        return dv_calculado == dv
 
     def validar_email(self, email: str) -> bool:
-        return re.match(r'^[\w\.-]+@[\w\.-]+\.\w+$', email) is not None
+        return _EMAIL_RE.match(email) is not None
 
     def validar_telefono(self, telefono: str) -> bool:
-        t = re.sub(r"[ \-()]+", "", telefono)
+        t = _TEL_STRIP_RE.sub("", telefono)
         return t.isdigit() and 7 <= len(t) <= 15
 
     def mapear_columnas_clave(self, df: pd.DataFrame):
@@ -282,17 +550,84 @@ class GestorDocentes:
         else:
             mostrar_mensaje("No se validará teléfono (columna no mapeada).", "advertencia")
 
+    def validar_ruts_masivo(self, df: pd.DataFrame) -> list:
+        # Chequeo de sanidad al abrir el archivo: valida la columna RUT
+        # completa de una pasada y devuelve los índices de fila inválidos.
+        ruts = normalizar_ruts(df[self.col_rut]).tolist()
+        if numba is None or not ruts:
+            return [i for i, r in enumerate(ruts) if not self.validar_rut(r)]
+        arr = np.zeros((len(ruts), 10), dtype=np.uint8)
+        largos = np.zeros(len(ruts), dtype=np.int64)
+        for i, r in enumerate(ruts):
+            b = r.encode("ascii", "replace")[:10]
+            arr[i, :len(b)] = np.frombuffer(b, dtype=np.uint8)
+            largos[i] = len(b)
+        validos = _ruts_validos_numba(arr, largos)
+        return np.where(~validos)[0].tolist()
+
+    def construir_indice_rut(self, df: pd.DataFrame):
+        # Normalizar la columna RUT completa en cada actualización/eliminación
+        # es O(filas) con una llamada de regex por celda; este índice lo reduce
+        # a una búsqueda de diccionario O(1). Ante RUT duplicados se conserva
+        # la primera fila (igual que antes) y se recuerda la clave para poder
+        # advertir que hay múltiples coincidencias.
+        self._rut_index = {}
+        self._rut_duplicados = set()
+        if not self.col_rut:
+            return
+        for i, v in enumerate(normalizar_ruts(df[self.col_rut])):
+            if v in self._rut_index:
+                self._rut_duplicados.add(v)
+            else:
+                self._rut_index[v] = i
+
+    def _flush_pending(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Los registros nuevos se acumulan en una lista y se materializan en
+        # un solo concat: concatenar por inserción copia el DataFrame completo
+        # en cada alta (cuadrático al agregar N registros seguidos).
+        if not self._pending_rows:
+            return df
+        base = len(df)
+        df = pd.concat([df, pd.DataFrame(self._pending_rows, columns=self.columnas)], ignore_index=True)
+        if self.col_rut:
+            for i, fila in enumerate(self._pending_rows):
+                clave = clean_rut(fila[self.col_rut])
+                if clave in self._rut_index:
+                    self._rut_duplicados.add(clave)
+                else:
+                    self._rut_index[clave] = base + i
+        self._pending_rows = []
+        self._estructura_cambiada = True
+        self._df_norm = None
+        return df
+
+    def _frame_normalizado(self, df: pd.DataFrame) -> pd.DataFrame:
+        # Normalizar todas las columnas en cada búsqueda repite el mismo
+        # trabajo; se cachea la copia normalizada y se invalida cuando el
+        # DataFrame muta (alta, edición o baja).
+        if self._df_norm is None:
+            norm = {}
+            for col in df.columns:
+                serie = df[col].fillna("").astype(str).str.lower().str.translate(_ACCENT_MAP)
+                if unidecode:
+                    resto = ~serie.map(str.isascii)
+                    if resto.any():
+                        serie[resto] = serie[resto].map(unidecode)
+                norm[col] = serie
+            self._df_norm = pd.DataFrame(norm, index=df.index)
+        return self._df_norm
+
     def buscar(self, df: pd.DataFrame, criterio: str) -> pd.DataFrame:
-        if unidecode:
-            crit = unidecode(criterio.strip().lower())
-            def match(val):
-                return crit in unidecode(str(val or '').lower())
-        else:
-            crit = criterio.strip().lower()
-            def match(val):
-                return crit in str(val or '').lower()
-        mask = df.apply(lambda row: any(match(row[c]) for c in df.columns), axis=1)
-        return df[mask]
+        if not len(df.columns):
+            return df
+        crit = normalizar_texto(criterio.strip())
+        # Búsqueda vectorizada: str.contains por columna sobre la copia
+        # normalizada, reducida con un OR en C en lugar de recorrer cada
+        # celda con apply(axis=1).
+        df_norm = self._frame_normalizado(df)
+        masks = [df_norm[col].str.contains(crit, regex=False, na=False).to_numpy()
+                 for col in df_norm.columns]
+        return df[np.logical_or.reduce(masks)]
 
     def paginar(self, df: pd.DataFrame, page_size: int = 20):
         total = len(df)
@@ -304,7 +639,7 @@ class GestorDocentes:
             start = i * page_size
             end = start + page_size
             subset = df.iloc[start:end]
-            print(tabulate(subset, headers='keys', tablefmt='fancy_grid', showindex=False))
+            print(renderizar_tabla(subset))
             mostrar_mensaje(f"Página {i+1}/{pages} ({start+1}-{min(end,total)} de {total})", "info")
             if i < pages - 1:
                 cont = input("Presione Enter para continuar, 'q' para salir, 's' para cambiar tamaño página: ").strip().lower()
@@ -346,8 +681,14 @@ class GestorDocentes:
                 self.columnas = df.columns.tolist()
             mostrar_mensaje("Archivo cargado correctamente.", "exito")
             self.mapear_columnas_clave(df)
+            if self._loaded and self.col_rut:
+                # Si el archivo ya se cargó (fallback del probe o archivo
+                # recién creado), el índice de RUT se construyó antes de que
+                # existiera la columna mapeada: rehacerlo ahora.
+                self._indexar_y_validar_ruts(df)
             mostrar_mensaje(f"Columnas finales: {self.columnas}", "info")
-            mostrar_mensaje(f"Total de registros: {len(df)}", "info")
+            total = len(df) if self._loaded else self._filas_archivo
+            mostrar_mensaje(f"Total de registros: {total if total is not None else '?'}", "info")
 
             while True:
                 print("\n" + Fore.MAGENTA + "="*60)
@@ -365,8 +706,10 @@ class GestorDocentes:
                 opcion = input("Seleccione opción (número o letra): ").strip().lower()
 
                 if opcion in ['1', 'v']:
+                    df = self._flush_pending(self._ensure_loaded(df))
                     self.paginar(df)
                 elif opcion in ['2', 'b']:
+                    df = self._flush_pending(self._ensure_loaded(df))
                     criterio = input("🔍 Ingrese término de búsqueda: ").strip()
                     if not criterio:
                         mostrar_mensaje("Debe ingresar un criterio de búsqueda.", "advertencia")
@@ -375,13 +718,13 @@ class GestorDocentes:
                         if filtrado.empty:
                             mostrar_mensaje("No se encontraron coincidencias.", "advertencia")
                         else:
-                            print(tabulate(filtrado, headers='keys', tablefmt='fancy_grid', showindex=False))
+                            print(renderizar_tabla(filtrado))
                 elif opcion in ['3', 'a']:
                     nuevo = {}
                     mostrar_mensaje("📝 Ingrese los datos del nuevo registro:", "info")
                     for col in self.columnas:
                         if self.col_rut and col == self.col_rut:
-                            valor = input_validado(f"{col}: ", self.validar_rut, "RUT inválido. Intenta nuevamente.", self.format_rut)
+                            valor = input_validado(f"{col}: ", self.validar_rut, "RUT inválido. Intenta nuevamente.", format_rut)
                         elif self.col_email and col == self.col_email:
                             valor = input_validado(f"{col} (opcional): ", self.validar_email, "Email inválido.", opcional=True)
                         elif self.col_tel and col == self.col_tel:
@@ -389,27 +732,26 @@ class GestorDocentes:
                         else:
                             valor = input(f"{col}: ").strip()
                         nuevo[col] = valor
-                    df = pd.concat([df, pd.DataFrame([nuevo])], ignore_index=True)
+                    self._pending_rows.append(nuevo)
                     mostrar_mensaje("Registro agregado correctamente.", "exito")
                     logging.info(f"Agregado registro: {nuevo}")
                 elif opcion in ['4', 'u']:
+                    df = self._flush_pending(self._ensure_loaded(df))
                     idx = None
                     if self.col_rut:
                         clave = input(f"✏️ Ingrese el {self.col_rut} del registro a actualizar: ").strip()
-                        clave_norm = self.clean_rut(clave)
-                        ser_norm = df[self.col_rut].fillna("").astype(str).apply(self.clean_rut)
-                        matches = df[ser_norm == clave_norm]
-                        if matches.empty:
+                        clave_norm = clean_rut(clave)
+                        idx = self._rut_index.get(clave_norm)
+                        if idx is None:
                             mostrar_mensaje(f"No se encontró un registro con {self.col_rut} = {clave}.", "error")
                             continue
-                        idx_list = matches.index.tolist()
-                        if len(idx_list) > 1:
+                        if clave_norm in self._rut_duplicados:
                             mostrar_mensaje("Hay múltiples coincidencias. Se mostrará la primera.", "advertencia")
-                        idx = idx_list[0]
                     else:
                         mostrar_mensaje("No está configurado el campo RUT para búsqueda. Abortando actualización.", "error")
                         continue
-                    mostrar_mensaje(f"Registro actual:\n{tabulate([df.loc[idx].to_dict()], headers='keys', tablefmt='fancy_grid')}", "info")
+                    mostrar_mensaje(f"Registro actual:\n{renderizar_tabla(df.loc[[idx]])}", "info")
+                    rut_cambiado = False
                     for col in self.columnas:
                         valor_actual = df.at[idx, col]
                         nuevo_valor = input(f"{col} [{valor_actual}]: ").strip()
@@ -418,7 +760,8 @@ class GestorDocentes:
                                 if not self.validar_rut(nuevo_valor):
                                     mostrar_mensaje("RUT inválido. Se mantiene el valor anterior.", "advertencia")
                                     continue
-                                nuevo_valor = self.format_rut(nuevo_valor)
+                                nuevo_valor = format_rut(nuevo_valor)
+                                rut_cambiado = clean_rut(nuevo_valor) != clave_norm
                             elif self.col_email and col == self.col_email:
                                 if not self.validar_email(nuevo_valor):
                                     mostrar_mensaje("Email inválido. Se mantiene el valor anterior.", "advertencia")
@@ -428,23 +771,33 @@ class GestorDocentes:
                                     mostrar_mensaje("Teléfono inválido. Se mantiene el valor anterior.", "advertencia")
                                     continue
                             df.at[idx, col] = nuevo_valor
+                            self._dirty_cells.add((idx, col))
+                            self._df_norm = None
+                    if rut_cambiado:
+                        # Otra fila puede compartir la clave anterior; un
+                        # parche puntual del índice la dejaría inubicable.
+                        self.construir_indice_rut(df)
                     mostrar_mensaje("Registro actualizado correctamente.", "exito")
                     logging.info(f"Actualizado registro idx={idx}")
                 elif opcion in ['5', 'd']:
+                    df = self._flush_pending(self._ensure_loaded(df))
                     if self.col_rut:
                         clave = input(f"🗑️ Ingrese el {self.col_rut} del registro a eliminar: ").strip()
-                        clave_norm = self.clean_rut(clave)
-                        ser_norm = df[self.col_rut].fillna("").astype(str).apply(self.clean_rut)
-                        matches = df[ser_norm == clave_norm]
-                        if matches.empty:
+                        clave_norm = clean_rut(clave)
+                        idx = self._rut_index.get(clave_norm)
+                        if idx is None:
                             mostrar_mensaje(f"No se encontró un registro con {self.col_rut} = {clave}.", "error")
                             continue
-                        idx_list = matches.index.tolist()
-                        idx = idx_list[0]
-                        mostrar_mensaje(f"Registro a eliminar:\n{tabulate([df.loc[idx].to_dict()], headers='keys', tablefmt='fancy_grid')}", "advertencia")
+                        mostrar_mensaje(f"Registro a eliminar:\n{renderizar_tabla(df.loc[[idx]])}", "advertencia")
                         confirm = input("¿Confirmar eliminación? (s/n): ").strip().lower()
                         if confirm == 's':
                             df = df.drop(idx).reset_index(drop=True)
+                            # Los índices de fila se desplazan tras el drop:
+                            # reconstruir el índice de RUT.
+                            self.construir_indice_rut(df)
+                            self._dirty_cells.clear()
+                            self._estructura_cambiada = True
+                            self._df_norm = None
                             mostrar_mensaje("Registro eliminado.", "exito")
                             logging.info(f"Eliminado registro idx={idx}")
                         else:
@@ -452,6 +805,11 @@ class GestorDocentes:
                     else:
                         mostrar_mensaje("No está configurado el campo RUT para búsqueda. Abortando eliminación.", "error")
                 elif opcion in ['6', 'g']:
+                    # Con solo altas pendientes, guardar() las anexa al
+                    # archivo sin cargarlo; cualquier otro cambio requiere
+                    # cargar y materializar antes de reescribir/parchar.
+                    if not self._solo_altas_pendientes():
+                        df = self._flush_pending(self._ensure_loaded(df))
                     self.guardar(df)
                     mostrar_mensaje("Saliendo del sistema. ¡Hasta luego!", "info")
                     break